@@ -936,7 +936,7 @@ def breakdown_regression_based_prediction(
     data_len = len(x_mat)
     cols = list(x_mat.columns)
 
-    breakdown_df["Intercept"] = np.repeat(intercept, data_len)
+    breakdown_df["Intercept"] = np.full(data_len, intercept, dtype=np.float64)
     if "Intercept" in cols:
         breakdown_df["Intercept"] += x_mat_weighted["Intercept"]
 
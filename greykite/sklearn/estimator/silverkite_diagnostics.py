@@ -15,6 +15,7 @@
 # limitations under the License.
 # original author: Sayan Patra
 """Silverkite plotting functions."""
+import re
 import warnings
 from typing import Type
 
@@ -29,9 +30,42 @@ from greykite.algo.forecast.silverkite.constants.silverkite_component import Sil
 from greykite.algo.forecast.silverkite.constants.silverkite_component import SilverkiteComponentsEnumMixin
 from greykite.algo.forecast.silverkite.constants.silverkite_constant import default_silverkite_constant
 from greykite.common import constants as cst
-from greykite.common.python_utils import get_pattern_cols
 from greykite.common.viz.timeseries_plotting import add_groupby_column
-from greykite.common.viz.timeseries_plotting import grouping_evaluation
+
+
+# Compiled once, used to classify the feature columns in `get_silverkite_components`.
+_TREND_REGEX = re.compile(cst.TREND_REGEX)
+_SEASONALITY_REGEX = re.compile(cst.SEASONALITY_REGEX)
+_LAG_REGEX = re.compile(cst.LAG_REGEX)
+_EVENT_REGEX = re.compile(cst.EVENT_REGEX)
+
+# Integer-valued seasonality groups below this value are used directly as group ids.
+_MAX_BINCOUNT_GROUPS = 1000
+
+
+def _grouped_nanmean(group_ids, values, n_groups):
+    """Computes the mean of ``values`` in each group, ignoring NAs.
+
+    Parameters
+    ----------
+    group_ids : `numpy.array`
+        Group of each value, as non-negative integers smaller than ``n_groups``.
+    values : `numpy.array`
+        Float values to average.
+    n_groups : `int`
+        Number of groups.
+
+    Returns
+    -------
+    means : `numpy.array`
+        Mean of each group, of length ``n_groups``.
+        NaN for groups without any non-NA value.
+    """
+    is_valid = ~np.isnan(values)
+    totals = np.bincount(group_ids, weights=np.where(is_valid, values, 0.0), minlength=n_groups)
+    counts = np.bincount(group_ids, weights=is_valid.astype(np.float64), minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return totals / counts
 
 
 class SilverkiteDiagnostics:
@@ -41,6 +75,9 @@ class SilverkiteDiagnostics:
     ----------
     _silverkite_components_enum : Type[SilverkiteComponentsEnum]
         The constants for plotting the silverkite components.
+    _seas_patterns : `tuple` [`tuple` [`str`, `re.Pattern`]]
+        The seasonality component names in ``_silverkite_components_enum``, with the
+        compiled regex matching the corresponding feature columns.
     model_dict : `dict` or None
         A dict with fitted model and its attributes.
         The output of `~greykite.algo.forecast.silverkite.forecast_silverkite.SilverkiteForecast.forecast`.
@@ -66,6 +103,9 @@ class SilverkiteDiagnostics:
             self,
             constants: SilverkiteComponentsEnumMixin = default_silverkite_constant):
         self._silverkite_components_enum: Type[SilverkiteComponentsEnum] = constants.get_silverkite_components_enum()
+        self._seas_patterns = tuple(
+            (seas, re.compile(self._silverkite_components_enum[seas].value.ylabel))
+            for seas in self._silverkite_components_enum.__dict__["_member_names_"])
         self.pred_category = None
         self.time_col = None
         self.value_col = None
@@ -111,10 +151,14 @@ class SilverkiteDiagnostics:
 
         if model_dict is not None:
             # tree models do not have beta
+            # ``to_numpy(copy=False)`` avoids copying ``x_mat`` when all its columns
+            # share one dtype, as in the float design matrix built by patsy;
+            # otherwise it copies, same as ``.values``
+            x_mat = model_dict["x_mat"]
             self.model_summary = ModelSummary(
-                x=model_dict["x_mat"].values,
+                x=x_mat.to_numpy(copy=False),
                 y=model_dict["y"].values,
-                pred_cols=list(model_dict["x_mat"].columns),
+                pred_cols=list(x_mat.columns),
                 pred_category=self.pred_category,
                 fit_algorithm=model_dict["fit_algorithm"],
                 ml_model=model_dict["ml_model"],
@@ -152,24 +196,15 @@ class SilverkiteDiagnostics:
         else:
             # Computes components for the training observations used to fit the model.
             # Observations with NAs that are dropped when fitting are not included.
-            x_mat = model_dict["x_mat"]
-            ml_model_coef = model_dict["ml_model"].coef_
-            ml_model_intercept = model_dict["ml_model"].intercept_
-            data_len = len(x_mat)
-            ml_cols = list(x_mat.columns)
-
-            x_mat_weighted = ml_model_coef * x_mat
-            if ml_model_intercept:
-                if "Intercept" in ml_cols:
-                    x_mat_weighted["Intercept"] += np.repeat(ml_model_intercept, data_len)
-                else:
-                    x_mat_weighted["Intercept"] = np.repeat(ml_model_intercept, data_len)
-
+            # The coefficients are applied per component, so that the weighted
+            # design matrix is never materialized.
             self.components = self.get_silverkite_components(
                 df=model_dict["df_dropna"],
                 time_col=self.time_col,
                 value_col=self.value_col,
-                feature_df=x_mat_weighted)
+                feature_df=model_dict["x_mat"],
+                coef=model_dict["ml_model"].coef_,
+                intercept=model_dict["ml_model"].intercept_)
 
         return self.plot_silverkite_components(
             components=self.components,
@@ -181,7 +216,9 @@ class SilverkiteDiagnostics:
             df,
             time_col,
             value_col,
-            feature_df):
+            feature_df,
+            coef=None,
+            intercept=None):
         """Compute the components of a ``Silverkite`` model.
 
         Notes
@@ -190,6 +227,8 @@ class SilverkiteDiagnostics:
         this function, without any changes to the `forecast_silverkite` function. User can compute `feature_df`
         as follows. Here `model_dict` is the output of `forecast_silverkite`.
         feature_df = model_dict["mod"].coef_ * model_dict["design_mat"]
+        Alternatively, pass ``feature_df=model_dict["design_mat"]`` and ``coef=model_dict["mod"].coef_``,
+        which avoids computing the weighted design matrix.
 
         The function aggregates components based on the column names of `feature_df`.
         `feature_df` is defined as the patsy design matrix built by `design_mat_from_formula`
@@ -216,6 +255,15 @@ class SilverkiteDiagnostics:
             The name of the value column in ``df``.
         feature_df : `pandas.DataFrame`
             A dataframe containing feature columns and values.
+            These are the features multiplied by their coefficients if ``coef`` is None,
+            otherwise the design matrix itself.
+        coef : `numpy.array` or None, default None
+            The model coefficients, one per column of ``feature_df``.
+            If provided, each component is computed as the product of its
+            ``feature_df`` columns with the corresponding coefficients.
+        intercept : `float` or None, default None
+            The model intercept. Only used when ``coef`` is provided.
+            It does not belong to any component and only affects the residual.
 
         Returns
         -------
@@ -242,50 +290,90 @@ class SilverkiteDiagnostics:
         if df.shape[0] != feature_df.shape[0]:
             raise ValueError("df and feature_df must have same number of rows.")
 
+        if coef is not None:
+            coef = np.asarray(coef)
+            if coef.shape != (feature_df.shape[1],):
+                raise ValueError("coef must have one value per column of feature_df.")
+
         feature_cols = feature_df.columns
-        components = df[[time_col, value_col]]
+        # collects the columns first and builds the dataframe once at the end,
+        # to avoid inserting columns one by one into a dataframe
+        components_dict = {
+            time_col: df[time_col],
+            value_col: df[value_col]}
+
+        # sums column groups on the underlying array to avoid a pandas reduction per component
+        feature_mat = feature_df.to_numpy(copy=False)
+        col_to_idx = {col: i for i, col in enumerate(feature_cols)}
+
+        def sum_cols(cols):
+            idx = np.fromiter((col_to_idx[col] for col in cols), dtype=np.intp, count=len(cols))
+            if coef is None:
+                return feature_mat[:, idx].sum(axis=1)
+            return feature_mat[:, idx] @ coef[idx]
+
+        # classifies the feature columns in a single pass.
+        # A column may belong to more than one category, e.g. interactions.
+        # Lag columns are split into autoregression (containing ``value_col``) and lagged regressors.
+        trend_cols = []
+        ar_cols = []
+        lagged_regressor_cols = []
+        seas_cols = []
+        event_cols = []
+        for col in feature_cols:
+            is_seas = _SEASONALITY_REGEX.search(col) is not None
+            is_lag = _LAG_REGEX.search(col) is not None
+            if is_seas:
+                seas_cols.append(col)
+            if is_lag:
+                if value_col in col:
+                    ar_cols.append(col)
+                else:
+                    lagged_regressor_cols.append(col)
+            elif not is_seas and _TREND_REGEX.search(col) is not None:
+                trend_cols.append(col)
+            if _EVENT_REGEX.search(col) is not None:
+                event_cols.append(col)
 
         # gets trend (this includes interaction terms)
-        trend_cols = get_pattern_cols(feature_cols, cst.TREND_REGEX, f"{cst.SEASONALITY_REGEX}|{cst.LAG_REGEX}")
         if trend_cols:
-            components["trend"] = feature_df[trend_cols].sum(axis=1)
+            components_dict["trend"] = sum_cols(trend_cols)
 
         # gets lagged terms (auto regression, lagged regressors and corresponding interaction terms)
-        lag_cols = get_pattern_cols(feature_cols, cst.LAG_REGEX)
-        if lag_cols:
-            ar_cols = [lag_col for lag_col in lag_cols if value_col in lag_col]
-            if ar_cols:
-                components["autoregression"] = feature_df[ar_cols].sum(axis=1)
-            lagged_regressor_cols = [lag_col for lag_col in lag_cols if value_col not in lag_col]
-            if lagged_regressor_cols:
-                components["lagged_regressor"] = feature_df[lagged_regressor_cols].sum(axis=1)
+        if ar_cols:
+            components_dict["autoregression"] = sum_cols(ar_cols)
+        if lagged_regressor_cols:
+            components_dict["lagged_regressor"] = sum_cols(lagged_regressor_cols)
 
         # gets seasonalities
-        seas_cols = get_pattern_cols(feature_cols, cst.SEASONALITY_REGEX)
-        seas_components_dict = self._silverkite_components_enum.__dict__["_member_names_"].copy()
-        for seas in seas_components_dict:
-            seas_pattern = self._silverkite_components_enum[seas].value.ylabel
-            seas_pattern_cols = get_pattern_cols(seas_cols, seas_pattern)
+        for seas, seas_regex in self._seas_patterns:
+            seas_pattern_cols = [col for col in seas_cols if seas_regex.search(col) is not None]
             if seas_pattern_cols:
-                components[seas] = feature_df[seas_pattern_cols].sum(axis=1)
+                components_dict[seas] = sum_cols(seas_pattern_cols)
 
         # gets events (holidays for now)
-        event_cols = get_pattern_cols(feature_cols, cst.EVENT_REGEX)
         if event_cols:
-            components["events"] = feature_df[event_cols].sum(axis=1)
+            components_dict["events"] = sum_cols(event_cols)
 
         # calculates residuals
-        components["residual"] = df[value_col].values - feature_df.sum(axis=1).values
+        if coef is None:
+            fitted = feature_mat.sum(axis=1)
+        else:
+            fitted = feature_mat @ coef
+            if intercept:
+                fitted = fitted + intercept
+        components_dict["residual"] = df[value_col].values - fitted
 
         # gets trend changepoints
         # keeps this column as the last column of the df
         if trend_cols:
             changepoint_dates = get_trend_changepoint_dates_from_cols(trend_cols=trend_cols)
             if changepoint_dates:
-                ts = pd.to_datetime(components[time_col])
-                changepoints = [1 if t in changepoint_dates else 0 for t in ts]
-                components["trend_changepoints"] = changepoints
+                ts = pd.to_datetime(df[time_col])
+                cp_index = pd.DatetimeIndex(changepoint_dates)
+                components_dict["trend_changepoints"] = ts.isin(cp_index).astype(np.int8).values
 
+        components = pd.DataFrame(components_dict, index=df.index)
         return components
 
     def group_silverkite_seas_components(self, df):
@@ -311,19 +399,44 @@ class SilverkiteDiagnostics:
         groupby_time_feature = self._silverkite_components_enum[seas].value.groupby_time_feature
         xlabel = self._silverkite_components_enum[seas].value.xlabel
         ylabel = self._silverkite_components_enum[seas].value.ylabel
-
-        def grouping_func(grp):
-            return np.nanmean(grp[seas])
+        if df.empty:
+            return pd.DataFrame({
+                xlabel: np.array([], dtype=np.float64),
+                ylabel: np.array([], dtype=np.float64)})
 
         result = add_groupby_column(
             df=df,
             time_col=time_col,
             groupby_time_feature=groupby_time_feature)
-        grouped_df = grouping_evaluation(
-            df=result["df"],
-            groupby_col=result["groupby_col"],
-            grouping_func=grouping_func,
-            grouping_func_name=ylabel)
+        groups = result["df"][result["groupby_col"]].to_numpy()
+        values = result["df"][seas].to_numpy(dtype=np.float64)
+        use_groups_as_ids = False
+        if np.issubdtype(groups.dtype, np.number) or np.issubdtype(groups.dtype, np.bool_):
+            with np.errstate(invalid="ignore"):
+                group_ids = groups.astype(np.intp)
+            is_in_range = group_ids.min() >= 0 and group_ids.max() < _MAX_BINCOUNT_GROUPS
+            use_groups_as_ids = is_in_range and np.array_equal(group_ids, groups)
+        if use_groups_as_ids:
+            # few integer-valued groups, e.g. weekly seasonality on daily data,
+            # are used as group ids directly
+            n_groups = group_ids.max() + 1
+            group_values = np.arange(n_groups).astype(groups.dtype)
+        else:
+            # otherwise, e.g. for string groups, group ids are the codes of the sorted unique groups.
+            # NA groups have code -1 and are dropped, same as in `pandas.DataFrame.groupby`.
+            group_ids, group_values = pd.factorize(groups, sort=True)
+            n_groups = len(group_values)
+            is_valid_group = group_ids >= 0
+            group_ids = group_ids[is_valid_group]
+            values = values[is_valid_group]
+        is_observed = np.bincount(group_ids, minlength=n_groups) > 0
+        means = _grouped_nanmean(
+            group_ids=group_ids,
+            values=values,
+            n_groups=n_groups)
+        grouped_df = pd.DataFrame({
+            result["groupby_col"]: group_values[is_observed],
+            ylabel: means[is_observed]})
         grouped_df.rename({result["groupby_col"]: xlabel}, axis=1, inplace=True)
         return grouped_df
 
@@ -331,7 +444,9 @@ class SilverkiteDiagnostics:
             self,
             components,
             names=None,
-            title=None):
+            title=None,
+            webgl_threshold=5000,
+            resample=False):
         """Plot the components of a ``Silverkite`` model.
 
         Parameters
@@ -346,11 +461,25 @@ class SilverkiteDiagnostics:
                 If `None`, all the available components are plotted.
         title: `str`, optional, default `None`
                 Title of the plot. If `None`, default title is "Component plot".
+        webgl_threshold: `int`, optional, default 5000
+                Components with more points than this threshold are plotted with
+                `plotly.graph_objects.Scattergl` (WebGL) instead of
+                `plotly.graph_objects.Scatter` (SVG), which is faster to render for long series.
+        resample: `bool`, optional, default False
+                Whether to wrap the figure in ``plotly_resampler.FigureResampler``, which
+                downsamples long components to the points that can be displayed.
+                The full resolution is shown on zoom when the figure is served with Dash,
+                e.g. via ``fig.show_dash()``.
+                Requires the optional module ``plotly_resampler``, whose releases require
+                ``pandas>=1.3.5``. It can not be installed alongside the ``pandas<1.3``
+                pinned by this package, so this option is only usable in environments
+                that override the pin.
 
         Returns
         -------
         fig: `plotly.graph_objects.Figure`
             Figure plotting components against appropriate time scale.
+            A ``plotly_resampler.FigureResampler`` if ``resample`` is True.
 
         Notes
         -----
@@ -362,19 +491,23 @@ class SilverkiteDiagnostics:
         --------
         `~greykite.sklearn.estimator.silverkite_diagnostics.get_silverkite_components`
         """
-
         time_col, value_col = components.columns[:2]
         if "trend_changepoints" in components.columns:
             trend_changepoints = components[time_col].loc[components["trend_changepoints"] == 1].tolist()
             components = components.drop("trend_changepoints", axis=1)
         else:
             trend_changepoints = None
+        # float32 is precise enough for display and halves the size of the figure data
+        components = components.astype({
+            col: np.float32 for col in components.columns
+            if col != time_col and components[col].dtype == np.float64})
         if names is None:
             names_kept = list(components.columns)[1:]  # do not include time_col
         else:
             # loops over components.columns to maintain the order of the components
-            names_kept = [component for component in list(components.columns) if component in names]
-            names_removed = set(names) - set(components.columns)
+            names_set = set(names)
+            names_kept = [component for component in components.columns if component in names_set]
+            names_removed = names_set.difference(components.columns)
 
             if not names_kept:
                 raise ValueError("None of the provided components have been specified in the model.")
@@ -386,6 +519,12 @@ class SilverkiteDiagnostics:
 
         num_rows = len(names_kept)
         fig = make_subplots(rows=num_rows, cols=1, vertical_spacing=0.35 / num_rows)
+        if resample:
+            try:
+                from plotly_resampler import FigureResampler
+            except ModuleNotFoundError:
+                raise ValueError("Module 'plotly_resampler' is not installed. Please install it manually.")
+            fig = FigureResampler(fig)
         if title is None:
             title = "Component plots"
         fig.update_layout(dict(showlegend=True, title=title, title_x=0.5, height=350 * num_rows))
@@ -397,14 +536,27 @@ class SilverkiteDiagnostics:
 
             xlabel, ylabel = df.columns
             row = ind + 1
-            fig.append_trace(go.Scatter(
-                x=df[xlabel],
-                y=df[ylabel],
-                name=name,
-                mode="lines",
-                opacity=0.8,
-                showlegend=False
-            ), row=row, col=1)
+            # NumPy arrays are serialized by plotly without a per-element conversion
+            x = df[xlabel].to_numpy()
+            y = df[ylabel].to_numpy()
+            scatter = go.Scattergl if len(df) > webgl_threshold else go.Scatter
+            if resample:
+                # passes the data separately so that only the downsampled points are stored in the trace
+                fig.add_trace(scatter(
+                    name=name,
+                    mode="lines",
+                    opacity=0.8,
+                    showlegend=False
+                ), hf_x=x, hf_y=y, row=row, col=1)
+            else:
+                fig.append_trace(scatter(
+                    x=x,
+                    y=y,
+                    name=name,
+                    mode="lines",
+                    opacity=0.8,
+                    showlegend=False
+                ), row=row, col=1)
 
             # `showline = True` shows a line only along the axes. i.e. for xaxis it will line the bottom
             # of the image, but not top. Adding `mirror = True` also adds the line to the top.
@@ -412,21 +564,36 @@ class SilverkiteDiagnostics:
             fig.update_yaxes(title_text=ylabel, showline=True, mirror=True, row=row, col=1)
 
         # plot trend change points
-        if trend_changepoints is not None and "trend" in names_kept:
-            for i, cp in enumerate(trend_changepoints):
-                show_legend = (i == 0)
+        if trend_changepoints and "trend" in names_kept:
+            trend_row = names_kept.index("trend") + 1
+            cp_line = dict(
+                color="#F44336",  # red 500
+                width=1.5,
+                dash="dash")
+            if resample:
+                # `FigureResampler` drops the `None` separators of the single trace below,
+                # so change points are drawn as layout shapes, which it does not process
+                for cp in trend_changepoints:
+                    fig.add_vline(x=cp, line=cp_line, row=trend_row, col=1)
+            else:
+                # all change points are drawn in a single trace, as vertical lines separated by `None`
+                trend_min = components["trend"].min()
+                trend_max = components["trend"].max()
+                x = []
+                y = []
+                for cp in trend_changepoints:
+                    x += [cp, cp, None]
+                    y += [trend_min, trend_max, None]
                 fig.append_trace(
                     go.Scatter(
                         name="trend change point",
                         mode="lines",
-                        x=[cp, cp],
-                        y=[components["trend"].min(), components["trend"].max()],
-                        line=go.scatter.Line(
-                            color="#F44336",  # red 500
-                            width=1.5,
-                            dash="dash"),
-                        showlegend=show_legend),
-                    row=names_kept.index("trend") + 1,
+                        x=x,
+                        y=y,
+                        line=go.scatter.Line(**cp_line),
+                        connectgaps=False,
+                        showlegend=True),
+                    row=trend_row,
                     col=1)
 
         return fig
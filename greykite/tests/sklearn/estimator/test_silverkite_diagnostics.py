@@ -1,10 +1,14 @@
 import datetime
+import importlib.util
+from enum import Enum
 
 import numpy as np
 import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
 
+from greykite.algo.forecast.silverkite.constants.silverkite_component import SilverkiteComponent
+from greykite.algo.forecast.silverkite.constants.silverkite_component import SilverkiteComponentsEnumMixin
 from greykite.common import constants as cst
 from greykite.common.features.timeseries_features import build_time_features_df
 from greykite.sklearn.estimator.silverkite_diagnostics import SilverkiteDiagnostics
@@ -84,7 +88,7 @@ def test_get_silverkite_components(test_params):
         "YEARLY_SEASONALITY": 6 * np.array([3.0, 3.0, 3.0, 3.0, 3.0]),
         cst.EVENT_PREFIX: np.array([1.0, 1.0, 1.0, 0.0, 0.0]),
         "residual": expected_residual,
-        "trend_changepoints": np.array([0, 1, 0, 1, 0]),
+        "trend_changepoints": np.array([0, 1, 0, 1, 0], dtype=np.int8),
     })
     assert_frame_equal(components, expected_df)
 
@@ -96,6 +100,31 @@ def test_get_silverkite_components(test_params):
         silverkite_diagnostics.get_silverkite_components(df, time_col, value_col, feature_df=pd.DataFrame({"ts": [1, 2, 3]}))
 
 
+def test_get_silverkite_components_with_coef(test_params):
+    """Tests get_silverkite_components with a design matrix and coefficients"""
+    time_col = test_params["time_col"]
+    value_col = test_params["value_col"]
+    df = test_params["df"]
+    feature_df = test_params["feature_df"]
+    coef = np.arange(1.0, feature_df.shape[1] + 1.0)
+    intercept = 2.0
+
+    silverkite_diagnostics: SilverkiteDiagnostics = SilverkiteDiagnostics()
+    components = silverkite_diagnostics.get_silverkite_components(
+        df,
+        time_col,
+        value_col,
+        feature_df,
+        coef=coef,
+        intercept=intercept)
+    expected_df = silverkite_diagnostics.get_silverkite_components(df, time_col, value_col, coef * feature_df)
+    expected_df["residual"] -= intercept
+    assert_frame_equal(components, expected_df)
+
+    with pytest.raises(ValueError, match="coef must have one value per column of feature_df."):
+        silverkite_diagnostics.get_silverkite_components(df, time_col, value_col, feature_df, coef=coef[1:])
+
+
 def test_plot_silverkite_components(test_params):
     """Tests plot_silverkite_components function"""
     time_col = test_params["time_col"]
@@ -108,10 +137,23 @@ def test_plot_silverkite_components(test_params):
 
     # Check plot_silverkite_components with defaults
     fig = silverkite_diagnostics.plot_silverkite_components(components)
-    assert len(fig.data) == 8 + 2  # 2 changepoints
-    assert [fig.data[i].name for i in range(len(fig.data))] == list(components.columns)[1: -1] + ["trend change point"] * 2
+    assert len(fig.data) == 8 + 1  # 2 changepoints in a single trace
+    assert [fig.data[i].name for i in range(len(fig.data))] == list(components.columns)[1: -1] + ["trend change point"]
+    cp_trace = fig.data[-1]
+    assert list(cp_trace.x) == [
+        datetime.datetime(2018, 1, 2),
+        datetime.datetime(2018, 1, 2),
+        None,
+        datetime.datetime(2018, 1, 4),
+        datetime.datetime(2018, 1, 4),
+        None]
+    assert list(cp_trace.y) == [5.0, 5.0, None, 5.0, 5.0, None]
+    assert cp_trace.showlegend is True
+    assert len(fig.layout.shapes) == 0
+
+    assert [fig.data[i].type for i in range(len(fig.data))] == ["scatter"] * 9
 
-    assert fig.layout.height == (len(fig.data) - 2) * 350  # changepoints do not create separate subplots
+    assert fig.layout.height == (len(fig.data) - 1) * 350  # changepoints do not create separate subplots
     assert fig.layout.showlegend is True  # legend for changepoints
     assert fig.layout.title["text"] == "Component plots"
     assert fig.layout.title["x"] == 0.5
@@ -134,6 +176,10 @@ def test_plot_silverkite_components(test_params):
     assert fig.layout.yaxis7.title["text"] == "events"
     assert fig.layout.yaxis8.title["text"] == "residual"
 
+    # Check plot_silverkite_components with WebGL traces
+    fig = silverkite_diagnostics.plot_silverkite_components(components, webgl_threshold=4)
+    assert [fig.data[i].type for i in range(len(fig.data))] == ["scattergl"] * 8 + ["scatter"]
+
     # Check plot_silverkite_components with provided component list and warnings
     with pytest.warns(Warning) as record:
         names = ["YEARLY_SEASONALITY", value_col, "DUMMY"]
@@ -163,6 +209,38 @@ def test_plot_silverkite_components(test_params):
         silverkite_diagnostics.plot_silverkite_components(components, names=names)
 
 
+@pytest.mark.skipif(importlib.util.find_spec("plotly_resampler") is None,
+                    reason="Module 'plotly_resampler' not installed, pytest for resampled component plot skipped.")
+def test_plot_silverkite_components_resample(test_params):
+    """Tests plot_silverkite_components with resampling"""
+    from plotly_resampler import FigureResampler
+
+    silverkite_diagnostics: SilverkiteDiagnostics = SilverkiteDiagnostics()
+    components = silverkite_diagnostics.get_silverkite_components(
+        test_params["df"],
+        test_params["time_col"],
+        test_params["value_col"],
+        test_params["feature_df"])
+    fig = silverkite_diagnostics.plot_silverkite_components(components, resample=True)
+    assert isinstance(fig, FigureResampler)
+    assert [fig.data[i].name for i in range(len(fig.data))] == list(components.columns)[1: -1]
+    assert len(fig.layout.shapes) == 2  # changepoints
+
+
+@pytest.mark.skipif(importlib.util.find_spec("plotly_resampler") is not None,
+                    reason="Module 'plotly_resampler' installed, pytest for missing module skipped.")
+def test_plot_silverkite_components_resample_not_installed(test_params):
+    """Tests plot_silverkite_components with resampling when plotly_resampler is not installed"""
+    silverkite_diagnostics: SilverkiteDiagnostics = SilverkiteDiagnostics()
+    components = silverkite_diagnostics.get_silverkite_components(
+        test_params["df"],
+        test_params["time_col"],
+        test_params["value_col"],
+        test_params["feature_df"])
+    with pytest.raises(ValueError, match="Module 'plotly_resampler' is not installed"):
+        silverkite_diagnostics.plot_silverkite_components(components, resample=True)
+
+
 def test_group_silverkite_seas_components():
     """Tests group_silverkite_seas_components"""
     silverkite_diagnostics: SilverkiteDiagnostics = SilverkiteDiagnostics()
@@ -195,6 +273,25 @@ def test_group_silverkite_seas_components():
     })
     assert_frame_equal(res, expected_df)
 
+    # Weekly with missing values
+    df.loc[df["WEEKLY_SEASONALITY"] == 0.0, "WEEKLY_SEASONALITY"] = np.nan
+    df.loc[0, "WEEKLY_SEASONALITY"] = 1.0
+    df.loc[1, "WEEKLY_SEASONALITY"] = 4.0
+    res = silverkite_diagnostics.group_silverkite_seas_components(df)
+    expected_df = pd.DataFrame({
+        "Day of week": np.arange(7.0),
+        "weekly": [1.0, 2.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    })
+    assert_frame_equal(res, expected_df)
+
+    # Empty input
+    res = silverkite_diagnostics.group_silverkite_seas_components(df.iloc[:0])
+    expected_df = pd.DataFrame({
+        "Day of week": np.array([], dtype=np.float64),
+        "weekly": np.array([], dtype=np.float64),
+    })
+    assert_frame_equal(res, expected_df)
+
     # Monthly
     date_list = pd.date_range(start="2018-01-01", end="2018-01-31", freq="D").tolist()
     time_df = build_time_features_df(date_list, conti_year_origin=2018)
@@ -250,3 +347,31 @@ def test_group_silverkite_seas_components():
         "yearly": np.arange(365.0)/365,
     })
     assert_frame_equal(res, expected_df)
+
+
+def test_group_silverkite_seas_components_str_groups():
+    """Tests group_silverkite_seas_components with a string groupby time feature"""
+    class StrSilverkiteComponentsEnum(Enum):
+        WEEKLY_SEASONALITY: SilverkiteComponent = SilverkiteComponent(
+            groupby_time_feature=cst.TimeFeaturesEnum.str_dow.value,
+            xlabel="Day of week",
+            ylabel="weekly")
+
+    class StrSilverkiteConstants(SilverkiteComponentsEnumMixin):
+        def get_silverkite_components_enum(self):
+            return StrSilverkiteComponentsEnum
+
+    silverkite_diagnostics: SilverkiteDiagnostics = SilverkiteDiagnostics(constants=StrSilverkiteConstants())
+    time_col = "ts"
+    date_list = pd.date_range(start="2018-01-01", end="2018-01-20", freq="D").tolist()
+    time_df = build_time_features_df(date_list, conti_year_origin=2018)
+    df = pd.DataFrame({
+        time_col: time_df["datetime"],
+        "WEEKLY_SEASONALITY": time_df["tow"]
+    })
+    res = silverkite_diagnostics.group_silverkite_seas_components(df)
+    expected_df = pd.DataFrame({
+        "Day of week": ["1-Mon", "2-Tue", "3-Wed", "4-Thu", "5-Fri", "6-Sat", "7-Sun"],
+        "weekly": np.arange(7.0),
+    })
+    assert_frame_equal(res, expected_df)